@@ -1,13 +1,28 @@
+import io
 import os
+import queue
 import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import math
+import numpy as np
 import ezdxf
+from ezdxf.addons import iterdxf
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; path statistics fall back to NumPy
+    njit = None
+import matplotlib
+matplotlib.use('Agg')  # Render off-screen; the GUI is tkinter, not matplotlib
 import matplotlib.pyplot as plt
+import reportlab
+from ezdxf.addons.drawing import Frontend, RenderContext
 from ezdxf.addons.drawing import matplotlib as ezdxf_matplotlib
+from ezdxf.addons.drawing.properties import LayoutProperties
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle, Paragraph,
+    BaseDocTemplate, PageTemplate, Frame, LongTable, TableStyle, Paragraph,
     Spacer, Image as RLImage
 )
 from reportlab.lib.styles import getSampleStyleSheet
@@ -20,161 +35,364 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import webbrowser
 
+_FONT_REGISTERED = False
 
-def calculate_total_length(doc):
+# Size of the part images in the PDF report and the resolution they are rendered for
+IMAGE_SIZE_CM = 6
+IMAGE_PRINT_DPI = 300
+
+# Bounds for the number of segments used to approximate a spline
+_SPLINE_MIN_SEGMENTS = 16
+_SPLINE_MAX_SEGMENTS = 200
+
+_TWO_PI = 2.0 * math.pi
+
+# reportlab release whose BaseDocTemplate.build() build_pdf_incrementally copies
+_REPORTLAB_BUILD_VERSION = (5, 0)
+
+# Axis-aligned directions as (angle, cos, sin), so arc extremes need no trig
+_CARDINAL_DIRECTIONS = (
+    (0.0, 1.0, 0.0),
+    (math.pi / 2, 0.0, 1.0),
+    (math.pi, -1.0, 0.0),
+    (3 * math.pi / 2, 0.0, -1.0),
+)
+
+# Widget updates posted by the processing thread, applied on the Tk main thread
+_gui_updates = queue.Queue()
+
+# Each rendering thread keeps one matplotlib figure and clears it between files
+_render_state = threading.local()
+
+
+def analyze_modelspace(doc):
+    """
+    Calculate the total length of lines and the bounding box area of a DXF
+    document in a single pass over the modelspace.
+    Splines are approximated once and shared by both calculations.
+    Returns a (total_length, area) tuple.
+    """
+    # Only entity types with handlers are visited; text, hatches etc. are skipped
+    total_length, area, _ = analyze_entities(doc.modelspace().query(_GEOMETRY_QUERY))
+    return total_length, area
+
+
+def analyze_dxf_file(dxf_path):
+    """
+    Calculate the total length of lines and the bounding box area of a DXF file
+    by streaming its modelspace entities, without loading the whole document.
+    Only ASCII DXF files can be streamed; binary files raise DXFStructureError.
+    Returns a (total_length, area, entity_count) tuple, where entity_count
+    includes entities without geometry, like len() of the modelspace.
+    """
+    doc_iter = iterdxf.opendxf(dxf_path)
+    try:
+        return analyze_entities(doc_iter.modelspace())
+    finally:
+        doc_iter.close()
+
+
+def analyze_entities(entities):
     """
-    Calculate the total length of lines in a DXF document.
-    Supports LINE, LWPOLYLINE, POLYLINE, CIRCLE, ARC, SPLINE.
+    Calculate the total length and the bounding box area of the given entities.
+    Entities without a handler, like text, are counted but otherwise skipped.
+    Returns a (total_length, area, entity_count) tuple.
     """
     total_length = 0.0
-    msp = doc.modelspace()
-    for entity in msp:
+    # Running bounding box; the infinite sentinels need no "first vertex" check
+    min_xy = np.array([math.inf, math.inf])
+    max_xy = np.array([-math.inf, -math.inf])
+    entity_count = 0
+    for entity in entities:
+        entity_count += 1
+        dxftype = entity.dxftype()
+        handler = _HANDLERS.get(dxftype)
+        if handler is None:
+            continue
         try:
-            length = 0.0
-            if entity.dxftype() == 'LINE':
-                length = calculate_line_length(entity)
-            elif entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                length = calculate_polyline_length(entity)
-            elif entity.dxftype() == 'CIRCLE':
-                length = calculate_circle_length(entity)
-            elif entity.dxftype() == 'ARC':
-                length = calculate_arc_length(entity)
-            elif entity.dxftype() == 'SPLINE':
-                length = calculate_spline_length(entity)
+            length, vertices = handler(entity)
             total_length += length
+            min_xy = np.minimum(min_xy, vertices.min(axis=0, initial=math.inf))
+            max_xy = np.maximum(max_xy, vertices.max(axis=0, initial=-math.inf))
         except Exception as e:
-            print(f"Error processing {entity.dxftype()}: {e}")
+            print(f"Error processing {dxftype}: {e}")
             continue
-    return total_length
+    if np.isfinite(min_xy).all():
+        width, height = max_xy - min_xy
+        area = float(width * height / 1_000_000)  # Convert from mm² to m²
+    else:
+        area = 0.0
+    return total_length, area, entity_count
 
 
-def calculate_line_length(entity):
+def calculate_path_length(points):
+    """
+    Calculate the length of the path through an (N, 2) array of points.
+    """
+    return float(np.hypot(np.diff(points[:, 0]), np.diff(points[:, 1])).sum())
+
+
+def _path_stats_loop(points):
+    length = 0.0
+    min_x = max_x = points[0, 0]
+    min_y = max_y = points[0, 1]
+    for i in range(1, points.shape[0]):
+        x = points[i, 0]
+        y = points[i, 1]
+        dx = x - points[i - 1, 0]
+        dy = y - points[i - 1, 1]
+        length += math.sqrt(dx * dx + dy * dy)
+        if x < min_x:
+            min_x = x
+        elif x > max_x:
+            max_x = x
+        if y < min_y:
+            min_y = y
+        elif y > max_y:
+            max_y = y
+    return length, min_x, min_y, max_x, max_y
+
+
+def _path_stats_numpy(points):
+    min_x, min_y = points.min(axis=0)
+    max_x, max_y = points.max(axis=0)
+    return calculate_path_length(points), min_x, min_y, max_x, max_y
+
+
+# With Numba the statistics are gathered in one pass without temporary arrays
+_path_stats = njit(cache=True, fastmath=True)(_path_stats_loop) if njit else _path_stats_numpy
+
+
+def calculate_path_stats(points):
+    """
+    Calculate the length of the path through an (N, 2) array of points together
+    with its extent. Returns (length, vertices), where vertices is a (2, 2)
+    array of the bounding box corners.
+    """
+    if not len(points):
+        return 0.0, np.empty((0, 2))
+    length, min_x, min_y, max_x, max_y = _path_stats(np.ascontiguousarray(points))
+    return float(length), np.array([(min_x, min_y), (max_x, max_y)], dtype=np.float64)
+
+
+# The scalar handlers below run once per entity; globals they use are bound as
+# default arguments so each call does a fast local lookup instead.
+def calculate_line_length(entity, _dist=math.dist):
     start = entity.dxf.start
     end = entity.dxf.end
-    length = math.hypot(end[0] - start[0], end[1] - start[1])
-    return length
+    # Scalar path: a single segment is not worth a NumPy round-trip
+    return _dist((start.x, start.y), (end.x, end.y))
 
 
-def calculate_polyline_length(entity):
-    length = 0.0
-    points = list(entity.get_points())
-    for i in range(len(points) - 1):
-        start = points[i]
-        end = points[i + 1]
-        length += math.hypot(end[0] - start[0], end[1] - start[1])
-    if entity.closed:
-        start = points[-1]
-        end = points[0]
-        length += math.hypot(end[0] - start[0], end[1] - start[1])
-    return length
-
-
-def calculate_circle_length(entity):
+def get_polyline_points(entity):
+    """
+    Return the polyline vertices as an (N, 2) array, repeating the first
+    vertex at the end if the polyline is closed.
+    Polyface and polygon mesh POLYLINEs are not paths and yield no points.
+    """
+    # Fetch only the coordinates, not widths and bulges
+    if entity.dxftype() == 'LWPOLYLINE':
+        pts = entity.get_points('xy')
+        closed = entity.closed
+    elif entity.is_2d_polyline or entity.is_3d_polyline:
+        pts = [(v.dxf.location.x, v.dxf.location.y) for v in entity.vertices]
+        closed = entity.is_closed
+    else:
+        # Mesh vertex lists also hold face records located at the origin
+        return np.empty((0, 2))
+    pts = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    if closed:
+        pts = np.vstack([pts, pts[:1]])
+    return pts
+
+
+def calculate_circle_length(entity, _TWO_PI=_TWO_PI):
+    return _TWO_PI * entity.dxf.radius
+
+
+def calculate_arc_length(entity, _radians=math.radians, _TWO_PI=_TWO_PI):
+    dxf = entity.dxf
+    angle = _radians(dxf.end_angle - dxf.start_angle)
+    if angle < 0:
+        angle += _TWO_PI
+    return dxf.radius * angle
+
+
+def estimate_control_length(entity):
+    """
+    Estimate the size of a spline from the length of its control polygon,
+    falling back to the fit points for splines defined only by those.
+    """
+    points = entity.control_points
+    if not len(points):
+        points = entity.fit_points
+    points = np.asarray([(p[0], p[1]) for p in points], dtype=np.float64).reshape(-1, 2)
+    return calculate_path_length(points)
+
+
+def approximate_spline(entity):
+    """
+    Approximate a spline with line segments, returning an (N, 2) array of points.
+    The number of segments follows the size of the spline.
+    """
+    segments = max(_SPLINE_MIN_SEGMENTS,
+                   min(_SPLINE_MAX_SEGMENTS, int(estimate_control_length(entity))))
+    points = entity.construction_tool().approximate(segments=segments)
+    return np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+
+def get_line_vertices(entity):
+    start = entity.dxf.start
+    end = entity.dxf.end
+    return np.array([(start.x, start.y), (end.x, end.y)], dtype=np.float64)
+
+
+def get_circle_vertices(entity):
+    center = entity.dxf.center
     radius = entity.dxf.radius
-    return 2 * math.pi * radius
+    return np.array([
+        (center[0] - radius, center[1]),
+        (center[0] + radius, center[1]),
+        (center[0], center[1] - radius),
+        (center[0], center[1] + radius),
+    ], dtype=np.float64)
+
+
+def angle_in_sweep(angle, start_angle, end_angle):
+    """
+    Check whether an angle lies on the counter-clockwise sweep from
+    start_angle to end_angle (all in radians).
+    """
+    sweep = (end_angle - start_angle) % _TWO_PI
+    if sweep == 0 and end_angle != start_angle:
+        sweep = _TWO_PI  # e.g. 0 to 360 degrees is a full turn, not an empty one
+    return (angle - start_angle) % _TWO_PI <= sweep
 
 
-def calculate_arc_length(entity):
+def get_arc_vertices(entity):
+    """
+    Return the arc endpoints plus every axis-aligned extreme point that lies
+    within the arc's sweep, so the bounding box covers the whole arc.
+    """
+    center = entity.dxf.center
     radius = entity.dxf.radius
     start_angle = math.radians(entity.dxf.start_angle)
     end_angle = math.radians(entity.dxf.end_angle)
-    angle = end_angle - start_angle
-    if angle < 0:
-        angle += 2 * math.pi
-    return radius * angle
+    vertices = [
+        (
+            center[0] + radius * math.cos(start_angle),
+            center[1] + radius * math.sin(start_angle)
+        ),
+        (
+            center[0] + radius * math.cos(end_angle),
+            center[1] + radius * math.sin(end_angle)
+        )
+    ]
+    for angle, dx, dy in _CARDINAL_DIRECTIONS:
+        if angle_in_sweep(angle, start_angle, end_angle):
+            vertices.append((center[0] + radius * dx, center[1] + radius * dy))
+    return np.array(vertices, dtype=np.float64)
 
 
-def calculate_spline_length(entity):
-    length = 0.0
-    spline_points = entity.approximate(segments=100)
-    for i in range(len(spline_points) - 1):
-        start = spline_points[i]
-        end = spline_points[i + 1]
-        length += math.hypot(end[0] - start[0], end[1] - start[1])
-    return length
+def measure_separately(entity, length_handler, vertex_handler):
+    """
+    Compute the length and the vertices of an entity independently, so an error
+    in one does not discard the other. A failed part is reported and counts as
+    zero length or no vertices.
+    """
+    try:
+        length = length_handler(entity)
+    except Exception as e:
+        print(f"Error calculating length of {entity.dxftype()}: {e}")
+        length = 0.0
+    try:
+        vertices = vertex_handler(entity)
+    except Exception as e:
+        print(f"Error calculating vertices of {entity.dxftype()}: {e}")
+        vertices = np.empty((0, 2))
+    return length, vertices
 
 
-def calculate_bounding_box_area(doc):
+def measure_line(entity):
+    return measure_separately(entity, calculate_line_length, get_line_vertices)
+
+
+def measure_polyline(entity):
+    return calculate_path_stats(get_polyline_points(entity))
+
+
+def measure_circle(entity):
+    return measure_separately(entity, calculate_circle_length, get_circle_vertices)
+
+
+def measure_arc(entity):
+    return measure_separately(entity, calculate_arc_length, get_arc_vertices)
+
+
+def measure_spline(entity):
+    return calculate_path_stats(approximate_spline(entity))
+
+
+# Per-entity handlers keyed by DXF type, looked up once per entity.
+# Each returns (length, vertices), with vertices as an (N, 2) float64 array.
+# Paths return only their bounding box corners, taken in the same pass over
+# their points as the length, so both depend on reading those points.
+_HANDLERS = {
+    'LINE': measure_line,
+    'LWPOLYLINE': measure_polyline,
+    'POLYLINE': measure_polyline,
+    'CIRCLE': measure_circle,
+    'ARC': measure_arc,
+    'SPLINE': measure_spline,
+}
+
+# ezdxf query selecting the entity types that have handlers
+_GEOMETRY_QUERY = ' '.join(_HANDLERS)
+
+
+def get_render_figure(dpi):
     """
-    Calculate the area of the minimal bounding rectangle for all entities in the DXF document.
+    Return the current thread's figure, cleared for a new drawing.
+    The figure is created on first use.
     """
-    msp = doc.modelspace()
-    min_x, min_y, max_x, max_y = None, None, None, None
-    for entity in msp:
-        try:
-            vertices = get_entity_vertices(entity)
-            for x, y in vertices:
-                min_x = x if min_x is None else min(min_x, x)
-                min_y = y if min_y is None else min(min_y, y)
-                max_x = x if max_x is None else max(max_x, x)
-                max_y = y if max_y is None else max(max_y, y)
-        except Exception as e:
-            print(f"Error processing {entity.dxftype()}: {e}")
-            continue
-    if None not in (min_x, min_y, max_x, max_y):
-        width = max_x - min_x
-        height = max_y - min_y
-        area = width * height / 1_000_000  # Convert from mm² to m²
-        return area
+    fig = getattr(_render_state, 'figure', None)
+    if fig is None:
+        fig = plt.figure(dpi=dpi)
+        _render_state.figure = fig
     else:
-        return 0.0
-
-
-def get_entity_vertices(entity):
-    vertices = []
-    if entity.dxftype() == 'LINE':
-        vertices.extend([entity.dxf.start[:2], entity.dxf.end[:2]])
-    elif entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-        vertices.extend([point[:2] for point in entity.get_points()])
-    elif entity.dxftype() == 'CIRCLE':
-        center = entity.dxf.center
-        radius = entity.dxf.radius
-        vertices.extend([
-            (center[0] - radius, center[1]),
-            (center[0] + radius, center[1]),
-            (center[0], center[1] - radius),
-            (center[0], center[1] + radius),
-        ])
-    elif entity.dxftype() == 'ARC':
-        center = entity.dxf.center
-        radius = entity.dxf.radius
-        start_angle = math.radians(entity.dxf.start_angle)
-        end_angle = math.radians(entity.dxf.end_angle)
-        vertices.extend([
-            (
-                center[0] + radius * math.cos(start_angle),
-                center[1] + radius * math.sin(start_angle)
-            ),
-            (
-                center[0] + radius * math.cos(end_angle),
-                center[1] + radius * math.sin(end_angle)
-            )
-        ])
-    elif entity.dxftype() == 'SPLINE':
-        spline_points = entity.approximate(segments=100)
-        vertices.extend([(p[0], p[1]) for p in spline_points])
-    return vertices
+        fig.clf()
+    return fig
 
 
-def render_dxf_to_image(doc, image_path):
+def render_dxf_to_image(doc, image_file):
     """
-    Render the DXF document to an image and save it to the specified path.
-    Uses ezdxf_matplotlib.qsave for reliable rendering.
+    Render the DXF document to a JPEG image and write it to image_file,
+    a path or a binary file-like object.
+    Draws the modelspace with the ezdxf matplotlib backend onto a reused figure.
     Returns True if successful, False otherwise.
     """
     try:
         fig_width, fig_height = 6, 6  # Inches
-        dpi = 300  # Resolution
+        # Resolution that yields IMAGE_PRINT_DPI once the image is scaled down
+        # to IMAGE_SIZE_CM in the PDF; rendering at more is wasted work
+        dpi = math.ceil(IMAGE_SIZE_CM / 2.54 * IMAGE_PRINT_DPI / fig_width)
+
+        fig = get_render_figure(dpi)
+        ax = fig.add_axes((0, 0, 1, 1))
+        msp = doc.modelspace()
+        layout_properties = LayoutProperties.from_layout(msp)
+        layout_properties.set_colors('#FFFFFF', '#000000')
 
         # Render the DXF document
-        ezdxf_matplotlib.qsave(
-            doc.modelspace(),
-            image_path,
-            size_inches=(fig_width, fig_height),
-            dpi=dpi,
-            bg='#FFFFFF',
-            fg='#000000',
+        Frontend(RenderContext(doc), ezdxf_matplotlib.MatplotlibBackend(ax)).draw_layout(
+            msp,
+            finalize=True,
+            layout_properties=layout_properties,
         )
+        # Drawing adjusts the figure to the drawing's aspect ratio, so size it afterwards
+        fig.set_size_inches(fig_width, fig_height, forward=True)
+        fig.savefig(image_file, format='jpg', dpi=dpi, facecolor=ax.get_facecolor(), transparent=True,
+                    pil_kwargs={'quality': 85, 'optimize': True})
         return True
     except Exception as e:
         print(f"Error rendering DXF to image: {e}")
@@ -184,10 +402,31 @@ def render_dxf_to_image(doc, image_path):
 def create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter):
     """
     Create a PDF document containing images of DXF files and a data table.
+    The report is assembled while the images arrive, without collecting the
+    flowables into a list first.
     """
-    # Register Arial font
-    pdfmetrics.registerFont(TTFont('Arial', r'C:\Windows\Fonts\arial.ttf'))
+    # Register Arial font once per process
+    global _FONT_REGISTERED
+    if not _FONT_REGISTERED:
+        pdfmetrics.registerFont(TTFont('Arial', r'C:\Windows\Fonts\arial.ttf'))
+        _FONT_REGISTERED = True
+
+    # Create the PDF document
+    doc = BaseDocTemplate(pdf_path, pagesize=A4)
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+    doc.addPageTemplates([PageTemplate(id='report', frames=[frame])])
+
+    flowables = generate_pdf_flowables(images, data, cost_per_meter, cost_per_square_meter)
+    build_pdf_incrementally(doc, flowables)
+
 
+def generate_pdf_flowables(images, data, cost_per_meter, cost_per_square_meter):
+    """
+    Yield the report flowables: an image with a caption for each DXF file,
+    followed by the cost table.
+    images may be a generator that appends to data as it is consumed (see
+    collect_results), so data is read only after images is exhausted.
+    """
     styles = getSampleStyleSheet()
     styleN = styles['Normal']
     styleN.fontName = 'Arial'
@@ -195,22 +434,16 @@ def create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter):
     styleH = styles['Heading1']
     styleH.fontName = 'Arial'
 
-    # Create the PDF document
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
-    elements = []
-
     # Fixed image dimensions
-    fixed_width = 6 * cm
-    fixed_height = 6 * cm
+    fixed_width = IMAGE_SIZE_CM * cm
+    fixed_height = IMAGE_SIZE_CM * cm
 
+    image_count = 0
     for image_info in images:
-        image_path = image_info['image_path']
-        if not os.path.exists(image_path):
-            print(f"Image {image_path} not found, skipping.")
-            continue
-        img_flowable = RLImage(image_path, width=fixed_width, height=fixed_height)
-        elements.append(img_flowable)
-        elements.append(Spacer(1, 0.2 * cm))
+        image_count += 1
+        image_data = io.BytesIO(image_info['image_data'])
+        yield RLImage(image_data, width=fixed_width, height=fixed_height)
+        yield Spacer(1, 0.2 * cm)
         filename = image_info['filename']
         total_length = image_info['total_length']
         quantity = image_info['quantity']
@@ -219,40 +452,44 @@ def create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter):
             f"{filename} - Длина линий: {total_length:.2f} мм, "
             f"Площадь: {area:.4f} м², Количество: {quantity}"
         )
-        caption = Paragraph(caption_text, styleN)
-        elements.append(caption)
-        elements.append(HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.grey))
-        elements.append(Spacer(1, 0.5 * cm))
+        yield Paragraph(caption_text, styleN)
+        yield HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.grey)
+        yield Spacer(1, 0.5 * cm)
+
+    # Every image belongs to a row of data, so data is complete by now
+    assert image_count <= len(data), "data must be filled before the images are exhausted"
 
     # Add the final table
-    elements.append(Paragraph('Таблица расчета стоимости', styleH))
-    elements.append(Spacer(1, 0.5 * cm))
+    yield Paragraph('Таблица расчета стоимости', styleH)
+    yield Spacer(1, 0.5 * cm)
     table_data = [
         ['Файл', 'Количество', 'Длина линий (мм)', 'Площадь (м²)',
          'Стоимость реза', 'Стоимость материала', 'Итого']
     ]
-    grand_total = 0.0
-    for item in data:
-        filename = item['Файл']
-        quantity = item['Количество']
-        total_length = item['Общая длина линий']
-        area = item['Площадь']
-        cutting_cost = (total_length / 1000) * cost_per_meter * quantity
-        material_cost = area * cost_per_square_meter * quantity
-        total = cutting_cost + material_cost
-        grand_total += total
-        table_data.append([
-            filename,
-            str(quantity),
-            f"{total_length:.2f}",
-            f"{area:.4f}",
-            f"{cutting_cost:.2f}",
-            f"{material_cost:.2f}",
-            f"{total:.2f}"
-        ])
+    filenames = [item['Файл'] for item in data]
+    quantities = np.fromiter((item['Количество'] for item in data), dtype=np.int64, count=len(data))
+    lengths = np.fromiter((item['Общая длина линий'] for item in data), dtype=np.float64, count=len(data))
+    areas = np.fromiter((item['Площадь'] for item in data), dtype=np.float64, count=len(data))
+    cutting_costs = (lengths / 1000) * cost_per_meter * quantities
+    material_costs = areas * cost_per_square_meter * quantities
+    totals = cutting_costs + material_costs
+    grand_total = totals.sum()
+    table_data.extend(
+        [list(row) for row in zip(
+            filenames,
+            quantities.astype(str).tolist(),
+            np.char.mod('%.2f', lengths).tolist(),
+            np.char.mod('%.4f', areas).tolist(),
+            np.char.mod('%.2f', cutting_costs).tolist(),
+            np.char.mod('%.2f', material_costs).tolist(),
+            np.char.mod('%.2f', totals).tolist(),
+        )]
+    )
     table_data.append(['', '', '', '', '', 'Общая стоимость', f"{grand_total:.2f}"])
 
-    table = Table(table_data, colWidths=[4 * cm, 2 * cm, 3 * cm, 3 * cm, 3 * cm, 3 * cm, 3 * cm])
+    # LongTable lays out large tables row by row when splitting across pages
+    table = LongTable(table_data, colWidths=[4 * cm, 2 * cm, 3 * cm, 3 * cm, 3 * cm, 3 * cm, 3 * cm],
+                      splitByRow=1)
     table.setStyle(TableStyle([
         ('FONTNAME', (0, 0), (-1, -1), 'Arial'),
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
@@ -262,8 +499,40 @@ def create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter):
         ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
         ('GRID', (0, 0), (-1, -1), 1, colors.black),
     ]))
-    elements.append(table)
-    doc.build(elements)
+    yield table
+
+
+def build_pdf_incrementally(doc, flowables):
+    """
+    Build the document from an iterable of flowables.
+    Unlike doc.build(), the flowables are not collected into a list first:
+    each one is laid out as soon as it is produced, so process_files can build
+    the report while files are still being processed. The drawn pages, image
+    streams included, are still held by reportlab until the file is saved.
+    """
+    # Mirrors BaseDocTemplate.build() from reportlab 5.0 and uses its private
+    # _startBuild/_endBuild, so any other release falls back to the public
+    # build(). Left out: the _onProgress callbacks (never set here), the
+    # PageBreakIfNotEmpty special case (not used in this report) and the
+    # _savedInfo handling, which only matters for pagecatcher-embedded PDFs.
+    if tuple(map(int, reportlab.Version.split('.')[:2])) != _REPORTLAB_BUILD_VERSION:
+        doc.build(list(flowables))
+        return
+
+    doc._startBuild()
+    canv = doc.canv
+    canv._doctemplate = doc
+    try:
+        pending = []
+        for flowable in flowables:
+            pending.append(flowable)
+            # handle_flowable consumes the list and pushes back any split parts
+            while pending:
+                doc.clean_hanging()
+                doc.handle_flowable(pending)
+    finally:
+        del canv._doctemplate
+    doc._endBuild()
 
 
 def extract_quantity_from_filename(filename):
@@ -280,91 +549,186 @@ def extract_quantity_from_filename(filename):
         return 1
 
 
-def process_files(directory, progress_label, cost_per_meter, cost_per_square_meter, open_report_button):
+def process_dxf_file(dxf_path, render_images=True):
     """
-    Processes DXF files in the specified directory and generates a PDF report.
+    Analyzes a single DXF file and, if render_images is set, renders it to an image.
+    Runs in a worker process, so it must not touch the GUI; the image is
+    returned as JPEG bytes in image_info['image_data'].
+    Returns a (data, image_info) tuple, where image_info is None if rendering
+    was skipped or failed, or None if the file could not be processed.
     """
-    data = []
-    images = []
-    temp_image_folder = os.path.join(directory, 'temp_images')
-    os.makedirs(temp_image_folder, exist_ok=True)
-
-    dxf_files = [f for f in os.listdir(directory) if f.lower().endswith('.dxf')]
+    filename = os.path.basename(dxf_path)
+    try:
+        doc = None
+        if render_images:
+            # Rendering needs the whole document
+            doc = ezdxf.readfile(dxf_path)
+        else:
+            # Only geometry is needed, so stream entities instead of loading the document
+            try:
+                total_length, area, entity_count = analyze_dxf_file(dxf_path)
+            except Exception as e:
+                print(f"Could not stream {filename} ({e}), reading the whole file.")
+                doc = ezdxf.readfile(dxf_path)
+        if doc is not None:
+            entity_count = len(doc.modelspace())
+            total_length, area = analyze_modelspace(doc)
+        if entity_count == 0:
+            print(f"No objects in {filename}, skipping.")
+            return None
+        quantity = extract_quantity_from_filename(filename)
+        data = {
+            'Файл': filename,
+            'Количество': quantity,
+            'Общая длина линий': total_length,
+            'Площадь': area
+        }
+        print(f"Total line length in {filename}: {total_length:.2f} mm")
+        print(f"Area of {filename}: {area:.4f} m²")
+        if not render_images:
+            return data, None
+        image_buffer = io.BytesIO()
+        success = render_dxf_to_image(doc, image_buffer)
+        image_info = None
+        if success:
+            image_info = {
+                'filename': filename,
+                'image_data': image_buffer.getvalue(),
+                'total_length': total_length,
+                'quantity': quantity,
+                'area': area
+            }
+            print(f"Image for {filename} created successfully.")
+        else:
+            print(f"Failed to create image for {filename}.")
+        return data, image_info
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return None
 
-    total_files = len(dxf_files)
-    processed_files = 0
 
-    for filename in dxf_files:
-        dxf_path = os.path.join(directory, filename)
-        progress_label.config(text=f"Обработка файла {filename}...")
-        progress_label.update()
+def process_files(directory, progress_label, cost_per_meter, cost_per_square_meter, open_report_button,
+                  render_images=True):
+    """
+    Processes DXF files in the specified directory and generates a PDF report.
+    Files are analyzed and rendered in parallel worker processes while this
+    thread assembles the PDF from the results that are already finished.
+    If render_images is False, the report contains only the cost table.
+    """
+    data = []
+    rendered_files = []
+    pdf_path = os.path.join(directory, 'dxf_files.pdf')
+    # Built under a temporary name so a failed run leaves an earlier report intact
+    temp_pdf_path = pdf_path + '.tmp'
+
+    # The default worker count is the CPU count, capped at 61 on Windows
+    with ProcessPoolExecutor() as executor:
+        # Submit files as the directory scan yields them; DirEntry caches the file type
+        futures = deque()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith('.dxf'):
+                    futures.append((entry.name, executor.submit(process_dxf_file, entry.path, render_images)))
+
+        total_files = len(futures)
+        post_widget_update(progress_label, text=f"Обработка файлов: {total_files}...")
+
+        progress_lock = threading.Lock()
+        processed_files = 0
+
+        def report_progress(future):
+            nonlocal processed_files
+            if future.exception() is not None or future.result() is None:
+                return
+            with progress_lock:
+                processed_files += 1
+                post_widget_update(progress_label, text=f"Processed {processed_files} of {total_files} files.")
+
+        for _, pending_future in futures:
+            pending_future.add_done_callback(report_progress)
+        pending_future = None  # the deque must hold the only reference to each future
+
+        # The PDF consumes results in directory order as they become available.
+        # Iterating images fills data, which create_pdf reads for the cost table
+        # only after the last image
+        images = collect_results(futures, data, rendered_files)
         try:
-            doc = ezdxf.readfile(dxf_path)
-            msp = doc.modelspace()
-            if len(msp) == 0:
-                print(f"No objects in {filename}, skipping.")
-                continue
-            total_length = calculate_total_length(doc)
-            area = calculate_bounding_box_area(doc)
-            quantity = extract_quantity_from_filename(filename)
-            data.append({
-                'Файл': filename,
-                'Количество': quantity,
-                'Общая длина линий': total_length,
-                'Площадь': area
-            })
-            print(f"Total line length in {filename}: {total_length:.2f} mm")
-            print(f"Area of {filename}: {area:.4f} m²")
-            image_filename = os.path.splitext(filename)[0] + '.jpg'
-            image_path = os.path.join(temp_image_folder, image_filename)
-            success = render_dxf_to_image(doc, image_path)
-            if success and os.path.exists(image_path):
-                images.append({
-                    'filename': filename,
-                    'image_path': image_path,
-                    'total_length': total_length,
-                    'quantity': quantity,
-                    'area': area
-                })
-                print(f"Image for {filename} created successfully.")
-            else:
-                print(f"Failed to create image for {filename}.")
+            create_pdf(images, data, temp_pdf_path, cost_per_meter, cost_per_square_meter)
         except Exception as e:
-            print(f"Error processing {filename}: {e}")
-            continue
-        processed_files += 1
-        progress_label.config(text=f"Processed {processed_files} of {total_files} files.")
-        progress_label.update()
-
-    if images:
-        pdf_path = os.path.join(directory, 'dxf_files.pdf')
-        progress_label.config(text="Creating PDF report...")
-        progress_label.update()
-        create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter)
-        progress_label.config(text=f"PDF report saved at: {pdf_path}")
-        progress_label.update()
+            # Report the failure now instead of waiting for the remaining files
+            executor.shutdown(cancel_futures=True)
+            try:
+                os.remove(temp_pdf_path)
+            except OSError:
+                pass
+            post_widget_update(progress_label, text=f"Failed to create PDF report: {e}")
+            print(f"Failed to create PDF report: {e}")
+            return
+
+    if rendered_files or (data and not render_images):
+        os.replace(temp_pdf_path, pdf_path)
+        post_widget_update(progress_label, text=f"PDF report saved at: {pdf_path}")
         print(f"PDF report saved at: {pdf_path}")
-        open_report_button.config(state='normal')
         open_report_button.pdf_path = pdf_path
+        post_widget_update(open_report_button, state='normal')
     else:
-        progress_label.config(text="Failed to create PDF report; no images available.")
-        progress_label.update()
+        os.remove(temp_pdf_path)
+        post_widget_update(progress_label, text="Failed to create PDF report; no images available.")
         print("Failed to create PDF report; no images available.")
 
-    # Clean up temporary images
-    for image_info in images:
+
+def collect_results(futures, data, rendered_files):
+    """
+    Wait for the (filename, future) pairs in order and yield the image info of
+    each processed file. Each file's data row is appended to data and the names
+    of files with an image to rendered_files.
+    Pairs are popped from the futures deque as they are consumed, so a
+    finished future and the image bytes it holds are released once drawn.
+    """
+    while futures:
+        filename, future = futures.popleft()
         try:
-            os.remove(image_info['image_path'])
+            result = future.result()
         except Exception as e:
-            print(f"Error deleting temporary file {image_info['image_path']}: {e}")
-    try:
-        os.rmdir(temp_image_folder)
-    except OSError:
-        pass
+            print(f"Error processing {filename}: {e}")
+            continue
+        if result is None:
+            continue
+        file_data, image_info = result
+        data.append(file_data)
+        if image_info is not None:
+            rendered_files.append(filename)
+            yield image_info
+
+
+def post_widget_update(widget, **options):
+    """
+    Schedule widget.config(**options) to run on the Tk main thread.
+    Safe to call from the processing thread.
+    """
+    _gui_updates.put((widget, options))
+
+
+def apply_widget_updates(root):
+    """
+    Apply the widget updates posted since the last call, then poll again.
+    Updates to the same widget are merged, so only the latest text is drawn.
+    """
+    pending = {}
+    while True:
+        try:
+            widget, options = _gui_updates.get_nowait()
+        except queue.Empty:
+            break
+        pending.setdefault(widget, {}).update(options)
+    for widget, options in pending.items():
+        widget.config(**options)
+    root.after(100, apply_widget_updates, root)
 
 
 def start_processing(directory, progress_label, generate_button,
-                     cost_per_meter_entry, cost_per_square_meter_entry, open_report_button):
+                     cost_per_meter_entry, cost_per_square_meter_entry, open_report_button,
+                     render_images_var):
     """
     Starts processing files in a separate thread.
     """
@@ -374,11 +738,13 @@ def start_processing(directory, progress_label, generate_button,
     except ValueError:
         messagebox.showerror("Ошибка", "Пожалуйста, введите корректные значения для стоимости.")
         return
+    render_images = render_images_var.get()
 
     generate_button.config(state='disabled')
     threading.Thread(
         target=process_files,
-        args=(directory, progress_label, cost_per_meter, cost_per_square_meter, open_report_button),
+        args=(directory, progress_label, cost_per_meter, cost_per_square_meter, open_report_button,
+              render_images),
         daemon=True
     ).start()
 
@@ -393,6 +759,7 @@ def main():
     root.configure(bg='#2e2e2e')
 
     selected_directory = tk.StringVar()
+    render_images_var = tk.BooleanVar(value=True)
 
     def select_directory():
         directory = filedialog.askdirectory()
@@ -413,7 +780,8 @@ def main():
                 generate_button,
                 cost_per_meter_entry,
                 cost_per_square_meter_entry,
-                open_report_button
+                open_report_button,
+                render_images_var
             )
         else:
             messagebox.showwarning("Warning", "Please select a directory first.")
@@ -456,6 +824,13 @@ def main():
     cost_per_square_meter_entry = tk.Entry(cost_frame, bg=entry_bg, fg=style_fg)
     cost_per_square_meter_entry.grid(row=1, column=1, padx=5, pady=5)
 
+    # Rendering is the slowest step; skip it when only the cost table is needed
+    render_images_check = tk.Checkbutton(cost_frame, text="Добавить изображения деталей",
+                                         variable=render_images_var, bg=style_bg, fg=style_fg,
+                                         selectcolor=entry_bg, activebackground=style_bg,
+                                         activeforeground=style_fg)
+    render_images_check.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+
     progress_label = tk.Label(root, text="", bg=style_bg, fg=style_fg)
     progress_label.pack(pady=10)
 
@@ -471,6 +846,7 @@ def main():
     root.columnconfigure(0, weight=1)
     root.rowconfigure(0, weight=1)
 
+    apply_widget_updates(root)
     root.mainloop()
 
 
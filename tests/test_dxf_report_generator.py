@@ -0,0 +1,227 @@
+import math
+import queue
+
+import ezdxf
+import pytest
+from reportlab.pdfbase.ttfonts import TTFont
+
+import dxf_report_generator as drg
+
+
+def analyze(msp):
+    return drg.analyze_modelspace(msp.doc)
+
+
+@pytest.fixture
+def msp():
+    return ezdxf.new().modelspace()
+
+
+def test_line_length_and_area(msp):
+    msp.add_line((0, 0), (30, 40))
+    total_length, area = analyze(msp)
+    assert total_length == pytest.approx(50.0)
+    assert area == pytest.approx(30 * 40 / 1_000_000)
+
+
+def test_line_length_survives_vertex_error(msp, monkeypatch):
+    msp.add_line((0, 0), (30, 40))
+
+    def broken_vertices(entity):
+        raise TypeError("an integer is required")
+
+    monkeypatch.setattr(drg, 'get_line_vertices', broken_vertices)
+    total_length, area = analyze(msp)
+    assert total_length == pytest.approx(50.0)
+    assert area == 0.0
+
+
+def test_mixed_entities(msp):
+    msp.add_line((0, 0), (100, 0))
+    msp.add_lwpolyline([(0, 0), (50, 0), (50, 50), (0, 50)], close=True)
+    msp.add_polyline2d([(10, 10), (20, 10), (20, 30)], close=True)
+    msp.add_circle((200, 200), 30)
+    msp.add_arc((-50, 0), 20, 30, 300)
+    msp.add_text("annotation")
+    total_length, area = analyze(msp)
+    expected_length = (
+        100 + 200 + (10 + 20 + math.hypot(10, 20))
+        + 2 * math.pi * 30 + 20 * math.radians(270)
+    )
+    assert total_length == pytest.approx(expected_length)
+    # x from the arc's 180 degree point (-70) to the circle (230),
+    # y from the arc's 270 degree point (-20) to the circle (230)
+    assert area == pytest.approx(300 * 250 / 1_000_000)
+
+
+def test_spline(msp):
+    msp.add_spline(fit_points=[(0, 0), (10, 0), (20, 0), (30, 0)])
+    total_length, area = analyze(msp)
+    assert total_length == pytest.approx(30.0, rel=1e-3)
+    assert area == pytest.approx(0.0, abs=1e-9)
+
+
+def test_full_circle_arc(msp):
+    msp.add_arc((0, 0), 10, 0, 360)
+    total_length, area = analyze(msp)
+    assert total_length == pytest.approx(2 * math.pi * 10)
+    assert area == pytest.approx(20 * 20 / 1_000_000)
+
+
+def test_polyface_is_ignored(msp):
+    msp.add_line((10, 10), (20, 10))
+    polyface = msp.add_polyface()
+    polyface.append_face([(10, 10, 0), (20, 10, 0), (20, 20, 0)])
+    total_length, area = analyze(msp)
+    assert total_length == pytest.approx(10.0)
+    assert area == 0.0
+
+
+def test_streamed_analysis_matches_document(msp, tmp_path):
+    msp.add_line((0, 0), (100, 0))
+    msp.add_circle((50, 50), 25)
+    msp.add_spline([(0, 0), (10, 40), (30, -20), (60, 10)])
+    dxf_path = tmp_path / 'part_3.dxf'
+    msp.doc.saveas(dxf_path)
+    total_length, area, entity_count = drg.analyze_dxf_file(str(dxf_path))
+    assert (total_length, area) == pytest.approx(analyze(msp))
+    assert entity_count == 3
+
+
+def test_extract_quantity_from_filename():
+    assert drg.extract_quantity_from_filename('partA_5.dxf') == 5
+    assert drg.extract_quantity_from_filename('partA.dxf') == 1
+
+
+@pytest.mark.parametrize('render_images', [True, False])
+@pytest.mark.parametrize('fmt', ['asc', 'bin'])
+def test_process_dxf_file(msp, tmp_path, fmt, render_images):
+    msp.add_line((0, 0), (30, 40))
+    dxf_path = tmp_path / 'part_2.dxf'
+    msp.doc.saveas(dxf_path, fmt=fmt)
+    data, image_info = drg.process_dxf_file(str(dxf_path), render_images)
+    assert data['Количество'] == 2
+    assert data['Общая длина линий'] == pytest.approx(50.0)
+    assert (image_info is not None) == render_images
+
+
+@pytest.mark.parametrize('render_images', [True, False])
+def test_process_dxf_file_annotation_only(msp, tmp_path, render_images):
+    msp.add_text("annotation")
+    dxf_path = tmp_path / 'notes.dxf'
+    msp.doc.saveas(dxf_path)
+    data, _ = drg.process_dxf_file(str(dxf_path), render_images)
+    assert data['Общая длина линий'] == 0.0
+
+
+@pytest.mark.parametrize('render_images', [True, False])
+def test_process_dxf_file_empty(msp, tmp_path, render_images):
+    dxf_path = tmp_path / 'empty.dxf'
+    msp.doc.saveas(dxf_path)
+    assert drg.process_dxf_file(str(dxf_path), render_images) is None
+
+
+class FakeWidget:
+    pdf_path = None
+
+    def __init__(self):
+        self.configured = []
+
+    def config(self, **options):
+        self.configured.append(options)
+
+
+@pytest.fixture
+def report_font(monkeypatch):
+    # Arial is loaded from the Windows font folder; use reportlab's bundled Vera instead
+    monkeypatch.setattr(drg, 'TTFont', lambda name, filename: TTFont(name, 'Vera.ttf'))
+    monkeypatch.setattr(drg, '_FONT_REGISTERED', False)
+
+
+def test_process_files_replaces_previous_report(msp, tmp_path, report_font):
+    msp.add_text("annotation only, no image is rendered")
+    msp.doc.saveas(tmp_path / 'notes.dxf')
+    (tmp_path / 'dxf_files.pdf').write_bytes(b'previous report')
+    drg.process_files(str(tmp_path), FakeWidget(), 10.0, 5.0, FakeWidget(), render_images=False)
+    assert (tmp_path / 'dxf_files.pdf').read_bytes().startswith(b'%PDF')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['dxf_files.pdf', 'notes.dxf']
+
+
+def test_process_files_failure_leaves_previous_report(tmp_path, report_font):
+    ezdxf.new().saveas(tmp_path / 'empty.dxf')
+    (tmp_path / 'dxf_files.pdf').write_bytes(b'previous report')
+    drg.process_files(str(tmp_path), FakeWidget(), 10.0, 5.0, FakeWidget())
+    assert (tmp_path / 'dxf_files.pdf').read_bytes() == b'previous report'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['dxf_files.pdf', 'empty.dxf']
+
+
+
+def test_process_files_reports_pdf_error(msp, tmp_path, monkeypatch):
+    msp.add_line((0, 0), (30, 40))
+    msp.doc.saveas(tmp_path / 'part.dxf')
+    (tmp_path / 'dxf_files.pdf').write_bytes(b'previous report')
+
+    def broken_create_pdf(images, data, pdf_path, cost_per_meter, cost_per_square_meter):
+        open(pdf_path, 'wb').close()
+        raise OSError("disk full")
+
+    monkeypatch.setattr(drg, 'create_pdf', broken_create_pdf)
+    progress_label = FakeWidget()
+    drg.process_files(str(tmp_path), progress_label, 10.0, 5.0, FakeWidget(), render_images=False)
+    updates = []
+    while not drg._gui_updates.empty():
+        updates.append(drg._gui_updates.get_nowait())
+    assert (progress_label, {'text': "Failed to create PDF report: disk full"}) in updates
+    assert (tmp_path / 'dxf_files.pdf').read_bytes() == b'previous report'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['dxf_files.pdf', 'part.dxf']
+
+
+@pytest.mark.parametrize('build_version', [drg._REPORTLAB_BUILD_VERSION, (0, 0)])
+def test_create_pdf(tmp_path, report_font, monkeypatch, build_version):
+    monkeypatch.setattr(drg, '_REPORTLAB_BUILD_VERSION', build_version)
+    data = [{'Файл': 'part_2.dxf', 'Количество': 2, 'Общая длина линий': 50.0, 'Площадь': 0.0012}]
+    pdf_path = tmp_path / 'report.pdf'
+    drg.create_pdf(iter([]), data, str(pdf_path), 10.0, 5.0)
+    assert pdf_path.read_bytes().startswith(b'%PDF')
+
+
+def cost_table(data):
+    *_, table = drg.generate_pdf_flowables(iter([]), data, 10.0, 5.0)
+    return table._cellvalues
+
+
+def test_cost_table():
+    data = [
+        {'Файл': 'a_2.dxf', 'Количество': 2, 'Общая длина линий': 1234.5, 'Площадь': 0.25},
+        {'Файл': 'b.dxf', 'Количество': 1, 'Общая длина линий': 100.0, 'Площадь': 0.0},
+    ]
+    assert cost_table(data)[1:] == [
+        ['a_2.dxf', '2', '1234.50', '0.2500', '24.69', '2.50', '27.19'],
+        ['b.dxf', '1', '100.00', '0.0000', '1.00', '0.00', '1.00'],
+        ['', '', '', '', '', 'Общая стоимость', '28.19'],
+    ]
+
+
+def test_cost_table_empty():
+    assert cost_table([])[1:] == [['', '', '', '', '', 'Общая стоимость', '0.00']]
+
+
+class FakeRoot:
+    def after(self, ms, func, *args):
+        self.scheduled = (ms, func, args)
+
+
+def test_apply_widget_updates(monkeypatch):
+    monkeypatch.setattr(drg, '_gui_updates', queue.Queue())
+    label, button, root = FakeWidget(), FakeWidget(), FakeRoot()
+    drg.post_widget_update(label, text="Processed 1 of 2 files.")
+    drg.post_widget_update(button, state='normal')
+    drg.post_widget_update(label, text="Processed 2 of 2 files.", fg='white')
+    drg.apply_widget_updates(root)
+    assert label.configured == [{'text': "Processed 2 of 2 files.", 'fg': 'white'}]
+    assert button.configured == [{'state': 'normal'}]
+    assert drg._gui_updates.empty()
+    assert root.scheduled == (100, drg.apply_widget_updates, (root,))
+
+    drg.apply_widget_updates(root)
+    assert label.configured == [{'text': "Processed 2 of 2 files.", 'fg': 'white'}]